@@ -9,26 +9,139 @@ Usage:
 
 import argparse
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
+from swe_lite_ra_aid.io_utils import dump_json, parse_json
 
-def reset_evaluation_fields(json_file, data):
+# Per-file work is almost entirely filesystem I/O, so threads overlap well
+MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Fields every prediction file must have, with their default values (None means current timestamp)
+DEFAULT_FIELDS = {
+    "model_name_or_path": "ra-aid-model",
+    "timestamp": None,
+    "ra_aid_model": "openrouter/deepseek/deepseek-chat",
+    "ra_aid_editor": "anthropic/claude-3-5-sonnet-20241022",
+    "resolved": False,
+}
+
+
+def load_json(json_file):
+    """Read a JSON file, returning both the raw bytes and the parsed data."""
+    raw = json_file.read_bytes()
+    return raw, parse_json(raw)
+
+
+def write_json_if_changed(json_file, raw, data):
+    """Write data to json_file unless it serializes to the bytes already on disk.
+
+    Returns:
+        bool: True if the file was rewritten
+    """
+    new_raw = dump_json(data)
+    if new_raw == raw:
+        return False
+    json_file.write_bytes(new_raw)
+    return True
+
+
+def list_prediction_files(predictions_dir):
+    """List the JSON files in predictions_dir using the d_type already returned by scandir."""
+    with os.scandir(predictions_dir) as entries:
+        return [
+            Path(entry.path)
+            for entry in entries
+            if entry.name.endswith(".json") and entry.is_file(follow_symlinks=False)
+        ]
+
+
+def append_missing_fields(raw, timestamp):
+    """
+    Fast path for prediction files in dump_json's layout that lack every default field:
+    splice the fields in before the closing brace without parsing the document.
+
+    Returns:
+        bytes or None: The patched file contents, or None if the full parse path is needed
+    """
+    body = raw.rstrip()
+    # Only dump_json's 2-space layout: keys indented by exactly two spaces, closing brace on its own line.
+    # Legacy files indented otherwise go through the full parse path and are rewritten in that layout.
+    if not (body.startswith(b'{\n  "') and body.endswith(b"\n}")):
+        return None
+    # A key name may also appear inside e.g. a patch, so only take this path when none do
+    if any(f'"{key}"'.encode() in raw for key in DEFAULT_FIELDS):
+        return None
+
+    fields = b",\n".join(
+        b"  " + json.dumps(key).encode() + b": " + json.dumps(timestamp if value is None else value).encode()
+        for key, value in DEFAULT_FIELDS.items()
+    )
+    return body[:-1].rstrip() + b",\n" + fields + b"\n}"
+
+
+def reset_evaluation_fields(data):
     """Reset evaluation fields in prediction data to False.
     
     Args:
-        json_file (Path): Path to the JSON file
         data (dict): Prediction data dictionary
-        
-    Returns:
-        bool: True if fields were modified
     """
-    modified = False
     data["resolved"] = False
     data["evaluated"] = False
-    modified = True
-    print(f"Reset evaluation fields for {json_file}")
-    return modified
+
+
+def fix_prediction_file(json_file, timestamp, reset_eval=False):
+    """
+    Add missing fields to a single prediction file, optionally resetting evaluation status.
+
+    Args:
+        json_file (Path): Path to the JSON file
+        timestamp (str): ISO timestamp to use for a missing timestamp field
+        reset_eval (bool): If True, reset evaluation fields to False
+
+    Returns:
+        bool: True if the file was modified
+    """
+    raw = json_file.read_bytes()
+    if not reset_eval:
+        patched = append_missing_fields(raw, timestamp)
+        if patched is not None:
+            json_file.write_bytes(patched)
+            print(f"Updated {json_file}")
+            return True
+
+    data = parse_json(raw)
+
+    # Steady state after the first migration: nothing to add, nothing to write
+    if not reset_eval and all(key in data for key in DEFAULT_FIELDS):
+        return False
+
+    # Add required fields if not present
+    for key, value in DEFAULT_FIELDS.items():
+        if key not in data:
+            data[key] = timestamp if value is None else value
+
+    # Reset evaluation fields if requested
+    if reset_eval:
+        reset_evaluation_fields(data)
+
+    # The serialized bytes decide, so a re-run that changes nothing doesn't touch the file
+    if write_json_if_changed(json_file, raw, data):
+        print(f"Updated {json_file}")
+        return True
+    return False
+
+
+def reset_prediction_file(json_file):
+    """Reset evaluation fields for a single prediction file."""
+    raw, data = load_json(json_file)
+    reset_evaluation_fields(data)
+    if write_json_if_changed(json_file, raw, data):
+        print(f"Reset evaluation fields for {json_file}")
+        return True
+    return False
 
 
 def fix_prediction_files(reset_eval=False):
@@ -38,49 +151,20 @@ def fix_prediction_files(reset_eval=False):
     Args:
         reset_eval (bool): If True, reset evaluation fields to False
     """
-    predictions_dir = Path("predictions/ra_aid_predictions")
-
-    for json_file in predictions_dir.glob("*.json"):
-        data = json.loads(json_file.read_text())
-
-        # Add required fields if not present
-        modified = False
-        if "model_name_or_path" not in data:
-            data["model_name_or_path"] = "ra-aid-model"
-            modified = True
-
-        if "timestamp" not in data:
-            data["timestamp"] = datetime.now().isoformat()
-            modified = True
-
-        if "ra_aid_model" not in data:
-            data["ra_aid_model"] = "openrouter/deepseek/deepseek-chat"
-            modified = True
-
-        if "ra_aid_editor" not in data:
-            data["ra_aid_editor"] = "anthropic/claude-3-5-sonnet-20241022"
-            modified = True
-            
-        if "resolved" not in data:
-            data["resolved"] = False
-            modified = True
-
-        # Reset evaluation fields if requested
-        if reset_eval:
-            modified = reset_evaluation_fields(json_file, data) or modified
-
-        if modified:
-            json_file.write_text(json.dumps(data, indent=4))
-            print(f"Updated {json_file}")
+    files = list_prediction_files(Path("predictions/ra_aid_predictions"))
+    # One timestamp for the whole batch, it is a single logical fix-up run
+    batch_ts = datetime.now().isoformat()
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(lambda f: fix_prediction_file(f, batch_ts, reset_eval), files))
 
 
 def reset_all_predictions():
     """Reset evaluation fields for all prediction files."""
-    predictions_dir = Path("predictions/ra_aid_predictions")
-    for json_file in predictions_dir.glob("*.json"):
-        data = json.loads(json_file.read_text())
-        if reset_evaluation_fields(json_file, data):
-            json_file.write_text(json.dumps(data, indent=4))
+    files = list_prediction_files(Path("predictions/ra_aid_predictions"))
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(reset_prediction_file, files))
 
 def main():
     parser = argparse.ArgumentParser(description="Fix or reset prediction file fields")
@@ -1,231 +1,296 @@
 """Module for handling RA-AID agent configuration and execution."""
 
+import codecs
+import functools
+import itertools
 import os
+import selectors
+import signal
 import subprocess
-import uuid
+import sys
+import time
 import logging
-from contextlib import contextmanager
+from collections import namedtuple
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
-from ra_aid.agent_utils import run_planning_agent, run_research_agent
 from ra_aid.llm import initialize_llm
-from .config import RA_AID_AIDER_MODEL, RA_AID_PROVIDER, RA_AID_MODEL, RA_AID_TEMPERATURE, RA_AID_EXPERT_PROVIDER, RA_AID_EXPERT_MODEL, STREAM_OUTPUT, TIMEOUT
+from .config import RA_AID_AIDER_MODEL, RA_AID_FULL_MODEL, DEFAULT_RA_AID_VERSION, RA_AID_PROVIDER, RA_AID_MODEL, RA_AID_TEMPERATURE, RA_AID_EXPERT_PROVIDER, RA_AID_EXPERT_MODEL, STREAM_OUTPUT, PROCESS_CHARS, PIN_RA_AID_CPU, TIMEOUT
 
 logger = logging.getLogger(__name__)
 
-
+# Result of a ra-aid run, stdout goes to the trajectory file so only stderr is kept
+StreamResult = namedtuple("StreamResult", ["returncode", "stderr"])
+
+# Max bytes per os.read on the ra-aid pipes. os.read returns whatever is already available,
+# so a large size doesn't delay streaming, it only cuts the number of reads on bursts of output.
+READ_CHUNK_SIZE = 64 * 1024
+
+# Extra environment for the ra-aid process. Its stdout is a pipe, not a tty, so without this
+# Python block-buffers it and streamed output arrives in large delayed bursts.
+RA_AID_ENV = {"PYTHONUNBUFFERED": "1"}
+
+# Round-robin counter used by pin_to_cpu
+_CPU_COUNTER = itertools.count()
+
+# Fixed part of the ra-aid command line, the prompt is appended per call.
+# ra-aid is started fresh for every task: the CLI has no daemon/RPC mode to feed prompts to,
+# and each task runs in its own worktree and venv so a shared process couldn't be reused anyway.
+RA_AID_CMD_PREFIX = (
+    "ra-aid",
+    "--cowboy-mode",
+    "--temperature",
+    str(RA_AID_TEMPERATURE),
+    "--provider",
+    RA_AID_PROVIDER,
+    "--model",
+    RA_AID_MODEL,
+    "--expert-provider",
+    RA_AID_EXPERT_PROVIDER,
+    "--expert-model",
+    RA_AID_EXPERT_MODEL,
+)
+
+
+@functools.lru_cache(maxsize=None)
 def initialize_model():
-    """Initialize the LLM model."""
+    """Initialize the LLM model once per process, later calls reuse the same client."""
     return initialize_llm(provider=RA_AID_PROVIDER, model_name=RA_AID_MODEL)
 
 
-# DEPRECATED using run_raaid method instead
-def get_agent_config():
-    """Get configuration for research agent"""
-    return {
-        "expert_enabled": False,
-        "hil": False,
-        "web_research_enabled": True,
-        "configurable": {"thread_id": str(uuid.uuid4())},
-        "recursion_limit": 100,
-        "research_only": True,
-        "cowboy_mode": True,
-    }
-
-
-def run_agents(research_prompt, planning_prompt, model):
-    """Run both research and planning agents with the given prompts.
-
-    DEPRECATED: cowboy_mode config is not working properly for planner agent.
-    Use run_raaid() instead.
+def _resolve_venv(repo_dir: Path) -> tuple[str, str]:
     """
-    config = get_agent_config()
-
-    # Run research agent
-    research_result = run_research_agent(
-        base_task_or_query=research_prompt,
-        model=model,
-        expert_enabled=config["expert_enabled"],
-        research_only=config["research_only"],
-        hil=config["hil"],
-        web_research_enabled=config["web_research_enabled"],
-        config=config,
-    )
-    logger.debug(f"research_result={research_result}")
-
-    # Run planning agent
-    planning_result = run_planning_agent(
-        base_task=planning_prompt,
-        model=model,
-        expert_enabled=config["expert_enabled"],
-        hil=config["hil"],
-        config=config,
-    )
-    logger.debug(f"planning_result={planning_result}")
-
-    return research_result, planning_result
-
-
-@contextmanager
-def activate_venv(repo_dir: Path):
+    Resolve and validate the .venv of repo_dir, returning (venv_path, venv_bin) as strings.
+    Not cached: every attempt runs in a fresh worktree, and a path reused later may hold a different venv.
     """
-    Context manager to activate and deactivate virtual environment.
-    Directly executes python from venv instead of using source activate.
-    """
-    logger.debug(f"Activating venv from directory: {os.getcwd()}")
-    logger.debug(f"Repo directory: {repo_dir}")
-
     # Use absolute path to ensure we get the correct .venv
     venv_path = (repo_dir / ".venv").resolve()
     venv_bin = venv_path / "bin"
     venv_python = venv_bin / "python"
 
-    logger.debug(f"Venv path: {venv_path}")
-    logger.debug(f"Venv python: {venv_python}")
-    
-    logger.debug("Environment before activation:")
-    logger.debug(f"Current VIRTUAL_ENV: {os.environ.get('VIRTUAL_ENV')}")
-    logger.debug(f"Current PATH: {os.environ.get('PATH')}")
-    logger.debug(f"Current Python: {subprocess.getoutput('which python')}")
-    logger.debug(f"Current Python version: {subprocess.getoutput('python --version')}")
-
     if not venv_python.exists():
         raise RuntimeError(f"Python executable not found in virtual environment: {venv_python}")
 
-    # Save original environment
-    old_env = dict(os.environ)
-    old_path = os.environ.get('PATH', '')
-    
+    return str(venv_path), str(venv_bin)
+
+
+def venv_env(repo_dir: Path) -> dict:
+    """
+    Build the environment for running a command inside the repo's virtual environment.
+    Returns a copy of os.environ with the venv activated, meant to be passed to Popen via env=,
+    so the parent's environment is never mutated and concurrent runs can't interfere.
+    """
+    logger.debug("Repo directory: %s", repo_dir)
+
+    venv_path, venv_bin = _resolve_venv(repo_dir)
+
+    env = dict(os.environ)
+    env["VIRTUAL_ENV"] = venv_path
+    env["PATH"] = f"{venv_bin}:{env.get('PATH', '')}"
+    env.pop("PYTHONHOME", None)
+
+    logger.debug("Venv path: %s", venv_path)
+    logger.debug("New PATH: %s", env["PATH"])
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("New Python version: %s", subprocess.getoutput(f"{venv_bin}/python --version"))
+
+    return env
+
+
+def collapse_carriage_returns(data: bytes) -> bytes:
+    """Keep only the text after the last carriage return of each line, as a terminal would show it."""
+    data = data.replace(b"\r\n", b"\n")
+    if b"\r" not in data:
+        return data
+    return b"\n".join(line.rpartition(b"\r")[2] for line in data.split(b"\n"))
+
+
+def collapse_carriage_returns_in_file(fh) -> None:
+    """
+    Apply collapse_carriage_returns to a binary file opened for reading and writing, line by line in place.
+    Collapsing never makes a line longer, so the rewritten lines can't overtake the ones still to be read.
+    """
+    fh.seek(0)
+    write_pos = 0
+    for line in iter(fh.readline, b""):
+        read_pos = fh.tell()
+        collapsed = collapse_carriage_returns(line)
+        fh.seek(write_pos)
+        fh.write(collapsed)
+        write_pos += len(collapsed)
+        fh.seek(read_pos)
+    fh.seek(write_pos)
+    fh.truncate()
+
+
+def kill_process_group(process: subprocess.Popen, grace_period: float = 2.0) -> None:
+    """
+    Terminate a process started with start_new_session=True together with everything it spawned.
+    Such a process is outside the terminal's foreground group, so callers must run this on any
+    abnormal exit (timeout, KeyboardInterrupt), Ctrl-C never reaches it by itself.
+    Sends SIGTERM to the whole group, then SIGKILL if it hasn't exited after grace_period seconds.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=grace_period)
+        except subprocess.TimeoutExpired:
+            pass
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass  # Group already gone
+    process.wait()
+
+
+def pin_to_cpu(pid: int) -> None:
+    """
+    Pin pid to one of the CPUs available to us, round-robin. The start is offset by our own pid
+    so that pool workers, each with their own counter, don't all pin to the same core.
+    No-op where os.sched_setaffinity is unavailable.
+    """
     try:
-        # Update environment variables
-        os.environ['VIRTUAL_ENV'] = str(venv_path)
-        os.environ['PATH'] = f"{venv_bin}:{old_path}"
-        
-        # Unset PYTHONHOME if set
-        os.environ.pop('PYTHONHOME', None)
-
-        logger.debug("Environment after activation:")
-        logger.debug(f"New VIRTUAL_ENV: {os.environ.get('VIRTUAL_ENV')}")
-        logger.debug(f"New PATH: {os.environ.get('PATH')}")
-        logger.debug(f"New Python: {subprocess.getoutput('which python')}")
-        logger.debug(f"New Python version: {subprocess.getoutput(f'{venv_python} --version')}")
-        
-        yield
-
-    finally:
-        # Restore original environment
-        os.environ.clear()
-        os.environ.update(old_env)
-
-
-def run_ra_aid(repo_dir: Path, prompt: str) -> Optional[tuple[str, str]]:
+        cpus = sorted(os.sched_getaffinity(0))
+        cpu = cpus[(os.getpid() + next(_CPU_COUNTER)) % len(cpus)]
+        os.sched_setaffinity(pid, {cpu})
+        logger.debug("Pinned ra-aid process %s to CPU %s", pid, cpu)
+    except AttributeError:
+        pass  # Not supported on this platform
+    except OSError as e:
+        logger.debug("Could not set CPU affinity of %s: %s", pid, e)
+
+
+def run_ra_aid(repo_dir: Path, prompt: str, trajectory_file: Path) -> Optional[tuple[Path, str]]:
     """
-    Call ra-aid with the given prompt in the activated virtual environment.
+    Call ra-aid with the given prompt in the repo's virtual environment.
     If STREAM_OUTPUT is True, streams output to console while capturing.
-    Returns tuple of (trajectory_output, returncode) if successful, else None.
+    The trajectory (stdout followed by any stderr) is written to trajectory_file.
+    Returns tuple of (trajectory_file, returncode) if successful, else None.
     """
     logger.info("\nStarting RA.Aid...")
 
-    cmd = [
-        "ra-aid",
-        "--cowboy-mode",
-        "--temperature",
-        str(RA_AID_TEMPERATURE),
-        "--provider",
-        RA_AID_PROVIDER,
-        "--model",
-        RA_AID_MODEL,
-        "--expert-provider",
-        RA_AID_EXPERT_PROVIDER,
-        "--expert-model",
-        RA_AID_EXPERT_MODEL,
-        "-m",
-        prompt,
-    ]
-
-    def create_streaming_process(cmd, cwd):
-        """Create a subprocess with streaming output configuration."""
+    cmd = [*RA_AID_CMD_PREFIX, "-m", prompt]
+
+    # Neither Popen call below passes preexec_fn, so on Linux with Python 3.10+ the child is started
+    # with vfork and the parent's memory isn't copied. posix_spawn is not an option: CPython skips it
+    # when cwd= or start_new_session= are set, and the worktree and kill_process_group need both.
+    def create_streaming_process(cmd, cwd, env):
+        """Create an unbuffered binary subprocess so its pipes can be read via os.read."""
         return subprocess.Popen(
             cmd,
             cwd=cwd,
-            text=True,
+            env=env,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            bufsize=1,
-            universal_newlines=True,
+            bufsize=0,
+            start_new_session=True,
         )
 
-    def process_char(c, current_line, output):
-        """Process a single character from stdout stream."""
-        if c == '\r':  # Carriage return
-            current_line.clear()
-        elif c == '\n':  # Newline
-            line = ''.join(current_line)
-            output.append(line + '\n')
-            current_line.clear()
-            print(line)  # Stream ra-aid output directly
-        else:
-            current_line.append(c)
-
-    def handle_stdout_stream(process, output):
-        """Handle streaming stdout output character by character."""
-        current_line = []
-        while True:
-            char = process.stdout.read(1)
-            if not char:
-                break
-            process_char(char, current_line, output)
-        
-        # Flush any remaining content
-        if current_line:
-            line = ''.join(current_line)
-            output.append(line)
-            print(line.rstrip())  # Stream final line directly
-
-    def handle_stderr_stream(process, error_output):
-        """Handle streaming stderr output line by line."""
-        for line in process.stderr:
-            logger.error(line.rstrip())
-            error_output.append(line)
-
-    def create_result_object(returncode, stdout, stderr):
-        """Create a result object matching the non-streaming case."""
-        return type(
-            "Result",
-            (),
-            {"returncode": returncode, "stdout": stdout, "stderr": stderr},
-        )()
-
-    output = []
-    error_output = []
+    def stream_process_output(process, traj_fh, error_output):
+        """
+        Multiplex stdout and stderr on their raw fds until both reach EOF. stdout is echoed to the
+        console as-is and written to traj_fh as it arrives (with carriage returns collapsed per
+        complete line if PROCESS_CHARS), raw stderr bytes are appended to error_output and
+        logged line by line.
+        Raises subprocess.TimeoutExpired if the streams are still open after TIMEOUT.
+        """
+        deadline = time.monotonic() + TIMEOUT
+        stdout_fd = process.stdout.fileno()
+        stdout_pending = bytearray()
+        stderr_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        stderr_pending = ""
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(stdout_fd, selectors.EVENT_READ)
+            selector.register(process.stderr.fileno(), selectors.EVENT_READ)
+
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(process.args, TIMEOUT)
+
+                for key, _ in selector.select(timeout=remaining):
+                    chunk = os.read(key.fd, READ_CHUNK_SIZE)
+                    if not chunk:
+                        selector.unregister(key.fd)
+
+                    if key.fd == stdout_fd:
+                        sys.stdout.buffer.write(chunk)  # Stream ra-aid output directly
+                        sys.stdout.flush()
+                        if not PROCESS_CHARS:
+                            traj_fh.write(chunk)
+                            continue
+                        # Only collapse complete lines, a \r may be followed by more text in the next chunk
+                        stdout_pending.extend(chunk)
+                        end = len(stdout_pending) if not chunk else stdout_pending.rfind(b"\n") + 1
+                        if end:
+                            traj_fh.write(collapse_carriage_returns(bytes(stdout_pending[:end])))
+                            del stdout_pending[:end]
+                        continue
+
+                    error_output.extend(chunk)
+                    text = stderr_decoder.decode(chunk, final=not chunk)
+                    *lines, stderr_pending = (stderr_pending + text).split('\n')
+                    if not chunk and stderr_pending:
+                        lines.append(stderr_pending)
+                    for line in lines:
+                        logger.error(line)
+
+        process.wait(timeout=max(deadline - time.monotonic(), 0))
 
     try:
-        with activate_venv(repo_dir):
-            if STREAM_OUTPUT:
-                process = create_streaming_process(cmd, repo_dir)
-                process.timeout = TIMEOUT
-                
-                handle_stdout_stream(process, output)
-                handle_stderr_stream(process, error_output)
-
-                process.wait()
-                stdout = "".join(output)
-                stderr = "".join(error_output)
-                result = create_result_object(process.returncode, stdout, stderr)
-            else:
-                # Just capture output without streaming
-                result = subprocess.run(
-                    cmd, cwd=repo_dir, text=True, capture_output=True, check=False, timeout=TIMEOUT
-                )
-
-        logger.debug(f"Current working directory after: {os.getcwd()}")
+        env = {**venv_env(repo_dir), **RA_AID_ENV}
+        if STREAM_OUTPUT:
+            error_output = bytearray()
+            # Write stdout to the trajectory file chunk by chunk instead of keeping it in memory
+            with open(trajectory_file, "wb") as traj_fh:
+                process = create_streaming_process(cmd, repo_dir, env)
+                if PIN_RA_AID_CPU:
+                    pin_to_cpu(process.pid)
+
+                # ra-aid runs in its own session so Ctrl-C doesn't reach it, make sure a timeout or
+                # KeyboardInterrupt never leaves it and its children running
+                try:
+                    stream_process_output(process, traj_fh, error_output)
+                finally:
+                    if process.poll() is None:
+                        kill_process_group(process)
+
+                if error_output:
+                    traj_fh.write(b"\nSTDERR:\n")
+                    traj_fh.write(error_output)
+            result = StreamResult(process.returncode, error_output.decode("utf-8", errors="replace"))
+        else:
+            # Send stdout straight to the trajectory file instead of buffering it in memory
+            with open(trajectory_file, "wb+") as traj_fh, subprocess.Popen(
+                cmd,
+                cwd=repo_dir,
+                env=env,
+                text=True,
+                stdout=traj_fh,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+            ) as process:
+                if PIN_RA_AID_CPU:
+                    pin_to_cpu(process.pid)
+                try:
+                    _, stderr = process.communicate(timeout=TIMEOUT)
+                finally:
+                    if process.poll() is None:
+                        kill_process_group(process)
+                if PROCESS_CHARS:
+                    collapse_carriage_returns_in_file(traj_fh)
+                if stderr:
+                    traj_fh.write(f"\nSTDERR:\n{stderr}".encode())
+            result = StreamResult(process.returncode, stderr)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Current working directory after: %s", os.getcwd())
 
         if not STREAM_OUTPUT:
             # Print output only if we didn't stream it
-            logger.info(stdout)
-            if stderr:
-                logger.error(stderr)
+            logger.info(f"ra-aid output written to {trajectory_file}")
+            if result.stderr:
+                logger.error(result.stderr)
 
         if result.returncode != 0:
             logging.error("ra-aid returned non-zero exit code.")
@@ -237,16 +302,13 @@ def run_ra_aid(repo_dir: Path, prompt: str) -> Optional[tuple[str, str]]:
         logging.error(f"ra-aid error: {e}")
         return None
 
-    trajectory_output = result.stdout + (f"\nSTDERR:\n{result.stderr}" if result.stderr else "")
-    return trajectory_output, str(result.returncode)
+    return trajectory_file, str(result.returncode)
 
 
 def create_result_dict(
     task, model_patch, edited_files, attempt, trajectory_file=None, repo_manager=None
 ):
     """Create standardized result dictionary"""
-    from .config import RA_AID_FULL_MODEL, DEFAULT_RA_AID_VERSION
-
     result = {
         "instance_id": task["instance_id"],
         "model_name_or_path": "ra-aid-model",
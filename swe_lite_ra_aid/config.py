@@ -33,6 +33,10 @@ RA_AID_AIDER_MODEL = RA_AID_FULL_MODEL  # Use same model for aider
 # TODO: Perhaps, disable traj/stdout capture while debugging with some configurable boolean.
 STREAM_OUTPUT = True
 
+# Whether to collapse carriage-return progress updates in captured ra-aid stdout so that
+# only the final overwrite of each line ends up in the trajectory. Set to False to keep the output verbatim.
+PROCESS_CHARS = True
+
 # Directory Configuration
 REPOS_DNAME = Path("repos")
 PREDS_DNAME = Path("predictions")
@@ -41,6 +45,10 @@ PREDS_DNAME = Path("predictions")
 MAX_ATTEMPTS = 3
 MAX_THREADS = 1
 
+# Pin each ra-aid process to a single CPU, spreading runs across cores when MAX_THREADS > 1.
+# Linux only, ignored on platforms without os.sched_setaffinity.
+PIN_RA_AID_CPU = False
+
 # Default RA-AID version if detection fails
 DEFAULT_RA_AID_VERSION = "ra-aid 0.12.1"
 
@@ -1,134 +1,380 @@
 """Analyze SWE-bench Lite dataset for unique setup commits and Python versions per repository."""
 
-import shutil
+import argparse
+import functools
+import json
+import os
 from .logger import logger
-import tempfile
-from collections import defaultdict
+import re
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datasets import load_dataset
-from git import Repo
+from git import Blob, Repo
+from .git import GIT_NETWORK_ENV, retry_git
 from pathlib import Path
-from typing import Dict, Set, Tuple
-from .uv_utils import detect_python_version
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from .uv_utils import PYTHON_VERSION_FILES, detect_python_version_from_files
 
+# Max number of repositories fetched and analyzed concurrently
+MAX_CLONE_WORKERS = 8
+# Max number of setup commits of a single repository read concurrently
+MAX_COMMIT_WORKERS = 4
 
-def clone_and_analyze_repo(repo_url: str, setup_commits: Set[str], temp_dir: Path) -> Tuple[Set[str], Dict[str, str]]:
-    """Clone a repository and analyze Python versions for each setup commit."""
+CACHE_DIR = Path.home() / ".cache" / "swe_lite_ra_aid"
+# Results of earlier runs, (repo, setup commit) -> Python version never changes so it only needs computing once
+VERSION_CACHE_FILE = CACHE_DIR / "commit_versions.json"
+# Bare repos holding the setup commits fetched so far, kept across runs so commits are only downloaded once
+REPO_CACHE_DIR = CACHE_DIR / "repos"
+
+# python_requires / requires-python pinning exactly one version, e.g. "==3.8"
+PINNED_PYTHON_RE = re.compile(
+    r"""(?:requires-python|python_requires)\s*=\s*["']?\s*==\s*(\d+\.\d+(?:\.\d+)?)\s*(?:["']|$)""", re.M
+)
+
+
+def load_version_cache() -> Dict[str, Optional[str]]:
+    """Load the cached "repo@commit" -> Python version results, empty if there is no usable cache."""
+    try:
+        return json.loads(VERSION_CACHE_FILE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_version_cache(cache: Dict[str, Optional[str]]) -> None:
+    """Write the version cache atomically so an interrupted run never leaves a truncated file behind."""
+    VERSION_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = VERSION_CACHE_FILE.with_suffix(".tmp")
+    tmp_file.write_text(json.dumps(cache, indent=2, sort_keys=True))
+    os.replace(tmp_file, VERSION_CACHE_FILE)
+
+
+def fetched_commits(repo_path: Path) -> Set[str]:
+    """
+    Commits already fetched into the cached bare repo at repo_path. Every setup commit is fetched
+    with depth 1, so git lists it in the shallow file. This avoids asking git about a missing
+    commit, which in a partial clone would lazily fetch it with its full history.
+    """
+    shallow_file = repo_path / "shallow"
+    return set(shallow_file.read_text().split()) if shallow_file.exists() else set()
+
+
+def pinned_python_version(files: Dict[str, str]) -> Optional[str]:
+    """
+    Return the Python version if pyproject.toml or setup.cfg pins exactly one and detection would report
+    that version too, else None. A .python-version file takes precedence and may change between commits,
+    so a repo with one never counts as pinned.
+    """
+    if files.get(".python-version"):
+        return None
+    for name in ("pyproject.toml", "setup.cfg"):
+        match = PINNED_PYTHON_RE.search(files.get(name, ""))
+        if match:
+            pinned_version = match.group(1)
+            return pinned_version if detect_python_version_from_files(files) == pinned_version else None
+    return None
+
+
+def version_file_blobs(repo: Repo, commit_sha: str) -> Tuple[Tuple[str, Blob], ...]:
+    """(name, blob) pairs of the PYTHON_VERSION_FILES present at the root of a commit, from one pass over its tree."""
+    return tuple(
+        (blob.name, blob) for blob in repo.commit(commit_sha).tree.blobs if blob.name in PYTHON_VERSION_FILES
+    )
+
+
+def extract_version_files(repo: Repo, commit_sha: str) -> Dict[str, str]:
+    """Read the PYTHON_VERSION_FILES present at the root of a commit."""
+    return {
+        name: blob.data_stream.read().decode("utf-8", errors="replace")
+        for name, blob in version_file_blobs(repo, commit_sha)
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def detect_python_version_from_blobs(blobs: Tuple[Tuple[str, Blob], ...]) -> Optional[str]:
+    """
+    Detect the Python version from the (name, blob) pairs of version_file_blobs.
+    Blobs hash by their object id, so setup commits sharing the same version files
+    are only read (and their blobs only fetched) and parsed once.
+    """
+    return detect_python_version_from_files(
+        {name: blob.data_stream.read().decode("utf-8", errors="replace") for name, blob in blobs}
+    )
+
+
+def clone_and_analyze_repo(
+    repo_url: str, setup_commits: Sequence[str], repos_dir: Path = REPO_CACHE_DIR, exhaustive: bool = False
+) -> Tuple[Set[str], Dict[str, Optional[str]], Dict[str, str]]:
+    """
+    Fetch the setup commits of a repository into its cached bare repo under repos_dir
+    and analyze Python versions for each of them.
+    Unless exhaustive is set, a repo whose first setup commit pins a single Python version in
+    pyproject.toml/setup.cfg (see pinned_python_version) is assumed to use it for every setup commit,
+    the rest aren't fetched.
+    Returns the set of detected versions, a map of every successfully checked commit
+    to its detected version, None if the commit doesn't declare one, and a map of the
+    commits whose version was assumed from the first commit's pin without checking them.
+    """
     python_versions = set()
     commit_versions = {}  # Map commits to their detected Python versions
-    
-    repo_name = repo_url.split("/")[-1]
-    repo_path = temp_dir / repo_name
-    
-    logger.info(f"\nCloning {repo_url} to analyze {len(setup_commits)} setup commits...")
+    assumed_versions = {}  # Map unchecked commits to the version pinned by the first one
+
+    repo_path = repos_dir / f"{repo_url.replace('/', '__')}.git"
+
     try:
-        repo = Repo.clone_from(f"https://github.com/{repo_url}", str(repo_path))
-        
-        for setup_commit in sorted(setup_commits):
-            logger.info(f"\nChecking setup commit: {setup_commit}")
+        if repo_path.exists():
+            repo = Repo(repo_path)
+        else:
+            # Instead of cloning the history, fetch only the setup commits themselves into an empty bare
+            # repo: depth 1 and no blobs. origin is marked as a promisor remote so the few blobs we read
+            # from each commit's tree are fetched on demand.
+            repo = Repo.init(repo_path, bare=True, mkdir=True)
+            repo.create_remote("origin", f"https://github.com/{repo_url}")
+            repo.git.config("remote.origin.promisor", "true")
+            repo.git.config("remote.origin.partialclonefilter", "blob:none")
+
+        available_commits = fetched_commits(repo_path)
+        missing_commits = [commit for commit in setup_commits if commit not in available_commits]
+        logger.info(
+            "\nFetching %d of %d setup commits of %s into %s...",
+            len(missing_commits),
+            len(setup_commits),
+            repo_url,
+            repo_path,
+        )
+        failed_commits = set()
+
+        def fetch_commits(commits: Sequence[str]) -> None:
+            """
+            Fetch commits in a single negotiation with the remote. If that fails,
+            fall back to fetching them one by one to find out which of them failed.
+            """
+            if not commits:
+                return
+            try:
+                # No kill_after_timeout: a killed shallow fetch can leave shallow.lock behind in the cached
+                # repo and break every later fetch. GIT_NETWORK_ENV's low speed limit aborts stalled transfers.
+                retry_git(
+                    repo.git.fetch, "origin", *commits, depth=1, filter="blob:none", no_tags=True, env=GIT_NETWORK_ENV
+                )
+                return
+            except Exception as e:
+                if len(commits) == 1:
+                    logger.error("Error fetching commit %s: %s", commits[0], e)
+                    failed_commits.add(commits[0])
+                    return
+                logger.warning("Error fetching %d commits of %s, retrying one by one: %s", len(commits), repo_url, e)
+            for commit in commits:
+                fetch_commits([commit])
+
+        if not exhaustive and setup_commits:
+            first_commit = setup_commits[0]
+            if first_commit in missing_commits:
+                fetch_commits([first_commit])
+                missing_commits.remove(first_commit)
+            if first_commit not in failed_commits:
+                try:
+                    pinned_version = pinned_python_version(extract_version_files(repo, first_commit))
+                except Exception as e:
+                    logger.error("Error checking commit %s: %s", first_commit, e)
+                    pinned_version = None
+                if pinned_version:
+                    logger.info(
+                        "%s pins Python %s at %s, using it for all setup commits",
+                        repo_url,
+                        pinned_version,
+                        first_commit,
+                    )
+                    repo.close()
+                    commit_versions[first_commit] = pinned_version
+                    assumed_versions.update(dict.fromkeys(setup_commits[1:], pinned_version))
+                    return {pinned_version}, commit_versions, assumed_versions
+
+        fetch_commits(missing_commits)
+
+        # GitPython keeps persistent cat-file processes per Repo which aren't thread-safe,
+        # so each worker thread opens its own Repo on the shared object database
+        local = threading.local()
+        thread_repos = []
+
+        def check_commit(setup_commit: str) -> Tuple[bool, Optional[str]]:
+            """Return (checked, python_version), checked is False if fetching or reading the commit failed."""
+            if setup_commit in failed_commits:
+                return False, None
+            if not hasattr(local, "repo"):
+                local.repo = Repo(repo_path)
+                thread_repos.append(local.repo)
+            logger.info("\nChecking setup commit: %s", setup_commit)
             try:
-                repo.git.checkout(setup_commit)
-                python_version = detect_python_version(repo_path)
-                if python_version:
-                    python_versions.add(python_version)
-                    commit_versions[setup_commit] = python_version
-                    logger.info(f"Found Python {python_version} for commit {setup_commit}")
+                return True, detect_python_version_from_blobs(version_file_blobs(local.repo, setup_commit))
             except Exception as e:
-                logger.error(f"Error checking commit {setup_commit}: {e}")
-                
+                logger.error("Error checking commit %s: %s", setup_commit, e)
+                return False, None
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(MAX_COMMIT_WORKERS, len(setup_commits))) as executor:
+                results = executor.map(check_commit, setup_commits)
+                for setup_commit, (checked, python_version) in zip(setup_commits, results):
+                    if checked:
+                        commit_versions[setup_commit] = python_version
+                    if python_version:
+                        python_versions.add(python_version)
+                        logger.info("Found Python %s for commit %s", python_version, setup_commit)
+        finally:
+            for opened_repo in (repo, *thread_repos):
+                opened_repo.close()
+
     except Exception as e:
-        logger.error(f"Error cloning/analyzing repo {repo_url}: {e}")
-    finally:
-        if repo_path.exists():
-            shutil.rmtree(repo_path)
-            
-    return python_versions, commit_versions
+        logger.error("Error fetching/analyzing repo %s: %s", repo_url, e)
 
+    return python_versions, commit_versions, assumed_versions
 
-def analyze_setup_commits():
-    """Analyze unique setup commits + python versions for each repository in the dataset."""
-    dataset = load_dataset("princeton-nlp/SWE-bench_Lite", split="test")
 
-    repo_setup_commits: Dict[str, Set[str]] = defaultdict(set)
+def emit_repo_report(
+    repo: str,
+    setup_commits: Sequence[str],
+    commit_counts: Counter,
+    repo_total: int,
+    commit_versions: Dict[str, Optional[str]],
+    python_versions: Set[str],
+    assumed_commits: Set[str],
+) -> None:
+    """
+    Log the setup commits of a repo with their Python versions and instance counts as one record.
+    Versions of assumed_commits were taken from the first commit's pin without checking them and are marked so.
+    """
+    lines = [
+        f"\nRepository: {repo}",
+        f"Number of unique setup commits: {len(setup_commits)}",
+        "Setup commits, their Python versions and instance counts:",
+    ]
+    for commit in setup_commits:
+        version = commit_versions.get(commit) or "unknown"
+        if commit in assumed_commits:
+            version += ", assumed from pin"
+        count = commit_counts[(repo, commit)]
+        lines.append(f"  - {commit}: Python {version} ({count} instances)")
+    lines.append(f"Total instances for this repo: {repo_total}")
+
+    lines.append(f"Unique Python versions detected: {len(python_versions)}")
+    lines.extend(f"  - Python {version}" for version in sorted(python_versions))
+    logger.info("\n".join(lines))
+
+
+def analyze_setup_commits(exhaustive: bool = False):
+    """
+    Analyze unique setup commits + python versions for each repository in the dataset.
+    See clone_and_analyze_repo for what exhaustive controls.
+    """
+    # Read the two columns straight from the memory-mapped Arrow table of the cached split,
+    # without formatting a dict per row, and without going to the network once the split is cached
+    table = load_dataset("princeton-nlp/SWE-bench_Lite", split="test").data
+    repo_column = table.column("repo").to_pylist()
+    commit_column = table.column("environment_setup_commit").to_pylist()
+
     repo_python_versions: Dict[str, Set[str]] = defaultdict(set)
-    repo_commit_versions: Dict[str, Dict[str, str]] = defaultdict(dict)
-
-    # First pass: collect all setup commits and their counts per repo
-    commit_counts = defaultdict(lambda: defaultdict(int))
-    total_commit_instances = 0
-    
-    for instance in dataset:
-        repo = instance["repo"]
-        setup_commit = instance["environment_setup_commit"]
-        repo_setup_commits[repo].add(setup_commit)
-        commit_counts[repo][setup_commit] += 1
-        total_commit_instances += 1
-
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-
-        for repo, setup_commits in repo_setup_commits.items():
-            versions, commit_versions = clone_and_analyze_repo(repo, setup_commits, temp_path)
-            repo_python_versions[repo].update(versions)
-            repo_commit_versions[repo].update(commit_versions)
+    repo_commit_versions: Dict[str, Dict[str, Optional[str]]] = defaultdict(dict)
+    # Commits whose version was assumed from a pin rather than checked, marked as such in the report
+    repo_assumed_commits: Dict[str, Set[str]] = defaultdict(set)
 
-    logger.info("\nRepository Setup Commit Analysis:")
-    logger.info("=" * 80)
+    # Instance counts per (repo, setup commit) and per repo
+    commit_counts: Counter = Counter(zip(repo_column, commit_column))
+    repo_totals: Counter = Counter(repo_column)
+    total_commit_instances = sum(repo_totals.values())
 
-    sorted_repos = sorted(
-        repo_setup_commits.items(), key=lambda x: len(x[1]), reverse=True
-    )
+    # Unique setup commits per repo, sorted once here and used both for fetching and for the report
+    repo_sorted_commits: Dict[str, List[str]] = {repo: [] for repo in repo_totals}
+    for repo, setup_commit in sorted(commit_counts):
+        repo_sorted_commits[repo].append(setup_commit)
 
-    for repo, setup_commits in sorted_repos:
-        num_commits = len(setup_commits)
-        python_versions = (
-            sorted(repo_python_versions[repo]) if repo in repo_python_versions else []
+    logger.info("\nRepository Setup Commit Analysis:\n" + "=" * 80)
+
+    def report_repo(repo: str) -> None:
+        emit_repo_report(
+            repo,
+            repo_sorted_commits[repo],
+            commit_counts,
+            repo_totals[repo],
+            repo_commit_versions[repo],
+            repo_python_versions[repo],
+            repo_assumed_commits[repo],
         )
-        commit_versions = repo_commit_versions[repo]
-
-        logger.info(f"\nRepository: {repo}")
-        logger.info(f"Number of unique setup commits: {num_commits}")
-        logger.info("Setup commits, their Python versions and instance counts:")
-        repo_total = 0
-        for commit in sorted(setup_commits):
-            version = commit_versions.get(commit, "unknown")
-            count = commit_counts[repo][commit]
-            repo_total += count
-            logger.info(f"  - {commit}: Python {version} ({count} instances)")
-        logger.info(f"Total instances for this repo: {repo_total}")
-
-        logger.info(f"Unique Python versions detected: {len(python_versions)}")
-        for version in python_versions:
-            logger.info(f"  - Python {version}")
-
-    logger.info("\nSummary:")
-    logger.info("=" * 80)
-    logger.info(f"Total repositories: {len(repo_setup_commits)}")
-    logger.info(
-        f"Repositories with multiple setup commits: "
-        f"{sum(1 for commits in repo_setup_commits.values() if len(commits) > 1)}"
-    )
-    logger.info(
-        f"Repositories with single setup commit: "
-        f"{sum(1 for commits in repo_setup_commits.values() if len(commits) == 1)}"
-    )
-    logger.info(f"Repositories with Python version detected: {len(repo_python_versions)}")
-    
-    total_unique_commits = sum(len(commits) for commits in repo_setup_commits.values())
-    logger.info(f"\nTotal instances across all repos: {total_commit_instances}")
-    logger.info(f"Total unique setup commits: {total_unique_commits}")
-    logger.info(f"Average instances per unique commit: {total_commit_instances/total_unique_commits:.2f}")
 
+    # Repos fully answered by the cache are reported right away, only fetch those with missing commits.
+    # Only checked commits are cached, versions assumed from a pin are recomputed on every run.
+    # An exhaustive run rechecks everything, caches written before that rule may still hold assumed versions.
+    version_cache = load_version_cache()
+    pending_repos: Dict[str, List[str]] = {}
+    for repo, setup_commits in repo_sorted_commits.items():
+        cached = {
+            commit: version_cache[f"{repo}@{commit}"]
+            for commit in setup_commits
+            if not exhaustive and f"{repo}@{commit}" in version_cache
+        }
+        repo_commit_versions[repo].update(cached)
+        repo_python_versions[repo].update(version for version in cached.values() if version)
+        missing_commits = [commit for commit in setup_commits if commit not in cached]
+        if missing_commits:
+            # Pass all of them so the pin check can use the first commit, already local if it was cached
+            pending_repos[repo] = setup_commits
+        else:
+            report_repo(repo)
+
+    # Fetches are network bound and independent per repo, each repo has its own cached bare repo.
+    # Each repo is reported as soon as it's done rather than after the slowest one.
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CLONE_WORKERS, len(pending_repos)))) as executor:
+        futures = {
+            executor.submit(clone_and_analyze_repo, repo, setup_commits, exhaustive=exhaustive): repo
+            for repo, setup_commits in pending_repos.items()
+        }
+
+        for future in as_completed(futures):
+            repo = futures[future]
+            versions, commit_versions, assumed_versions = future.result()
+            repo_python_versions[repo].update(versions)
+            # An assumed version never overrides one checked in an earlier run
+            for commit, version in assumed_versions.items():
+                if commit not in repo_commit_versions[repo]:
+                    repo_commit_versions[repo][commit] = version
+                    repo_assumed_commits[repo].add(commit)
+            repo_commit_versions[repo].update(commit_versions)
+
+            version_cache.update((f"{repo}@{commit}", version) for commit, version in commit_versions.items())
+            save_version_cache(version_cache)
+            report_repo(repo)
+
+    total_unique_commits = sum(len(commits) for commits in repo_sorted_commits.values())
     all_versions = set()
     for versions in repo_python_versions.values():
         all_versions.update(versions)
-    logger.info(f"Total unique Python versions detected: {len(all_versions)}")
-    logger.info("All Python versions:")
-    for version in sorted(all_versions):
-        logger.info(f"  - Python {version}")
 
+    lines = [
+        "\nSummary:",
+        "=" * 80,
+        f"Total repositories: {len(repo_sorted_commits)}",
+        f"Repositories with multiple setup commits: "
+        f"{sum(1 for commits in repo_sorted_commits.values() if len(commits) > 1)}",
+        f"Repositories with single setup commit: "
+        f"{sum(1 for commits in repo_sorted_commits.values() if len(commits) == 1)}",
+        f"Repositories with Python version detected: {len(repo_python_versions)}",
+        f"\nTotal instances across all repos: {total_commit_instances}",
+        f"Total unique setup commits: {total_unique_commits}",
+        f"Average instances per unique commit: {total_commit_instances/total_unique_commits:.2f}",
+        f"Total unique Python versions detected: {len(all_versions)}",
+        "All Python versions:",
+    ]
+    lines.extend(f"  - Python {version}" for version in sorted(all_versions))
+    logger.info("\n".join(lines))
 
 if __name__ == "__main__":
-    analyze_setup_commits()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--exhaustive",
+        action="store_true",
+        help="Check every setup commit instead of assuming a version pinned by a repo's first setup commit",
+    )
+    args = parser.parse_args()
+    analyze_setup_commits(exhaustive=args.exhaustive)
 
 
 # Results for princeton-nlp/SWE-bench_Lite at 1/14/2025
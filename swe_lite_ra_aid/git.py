@@ -1,20 +1,63 @@
-from git import Repo
+import re
+import subprocess
+import time
+
+from git import GitCommandError, Repo
 from .logger import logger
 
+# Names of the files touched by a unified diff, from its "--- a/" and "+++ b/" header lines
+PATCH_FILE_RE = re.compile(r"^(?:--- a/|\+\+\+ b/)(.+)$", re.MULTILINE)
+
+# Environment for git commands that talk to GitHub: fail instead of waiting on a credentials prompt,
+# and use protocol v2 so only the refs we ask for are advertised (GIT_CONFIG_* needs git >= 2.31)
+GIT_NETWORK_ENV = {
+    "GIT_TERMINAL_PROMPT": "0",
+    "GIT_ASKPASS": "echo",
+    "GIT_CONFIG_COUNT": "1",
+    "GIT_CONFIG_KEY_0": "protocol.version",
+    "GIT_CONFIG_VALUE_0": "2",
+    # Abort transfers stalled below 1 KB/s for 10s instead of waiting for the TCP timeout, retry_git retries them
+    "GIT_HTTP_LOW_SPEED_LIMIT": "1000",
+    "GIT_HTTP_LOW_SPEED_TIME": "10",
+}
+
+# Failures of network git commands that retrying won't fix
+PERMANENT_GIT_ERRORS = ("not our ref", "Repository not found", "couldn't find remote ref", "Authentication failed")
+
+
+def _run_git(repo_path, *args) -> str:
+    """
+    Run a git command directly in repo_path, skipping GitPython's per-call overhead.
+    Like GitPython, strips the trailing newline from the output and decodes it with surrogateescape,
+    so patches of CRLF or non-UTF-8 files come back byte for byte instead of altered or failing.
+    """
+    result = subprocess.run(["git", "-C", str(repo_path), *args], capture_output=True, check=True)
+    return result.stdout.decode("utf-8", "surrogateescape").removesuffix("\n")
+
 
 def diff_versus_commit(git_dname, commit) -> str:
-    repo = Repo(git_dname)
-    return repo.git.diff(commit)
+    return _run_git(git_dname, "diff", commit)
 
 
 def files_in_patch(patch):
-    files = []
-    for line in patch.split("\n"):
-        if line.startswith("--- a/") or line.startswith("+++ b/"):
-            fname = line.split("/", 1)[1]
-            if fname not in files:
-                files.append(fname)
-    return files
+    return list(dict.fromkeys(PATCH_FILE_RE.findall(patch)))
+
+
+def retry_git(call, *args, attempts=3, backoff=2.0, **kwargs):
+    """
+    Run a git call that talks to the network, retrying transient failures with exponential backoff.
+    Errors in PERMANENT_GIT_ERRORS and the last attempt's error are raised right away.
+    """
+    for attempt in range(attempts):
+        try:
+            return call(*args, **kwargs)
+        except GitCommandError as e:
+            stderr = str(e.stderr)
+            if attempt == attempts - 1 or any(error in stderr for error in PERMANENT_GIT_ERRORS):
+                raise
+            delay = backoff**attempt
+            logger.warning(f"Git command failed with status {e.status}, retrying in {delay:.0f}s: {stderr.strip()}")
+            time.sleep(delay)
 
 
 def checkout_repo_url_commit(git_tempdir, repo_url, commit):
@@ -34,9 +77,6 @@ def checkout_repo(git_tempdir, entry):
 
 def stage_and_get_patch(worktree_path: str) -> str:
     """Stage all changes and generate a patch against HEAD."""
-    repo = Repo(worktree_path)
     # Add all files except .venv directory because .venv is symbolinked, will be edited everytime
-    repo.git.add('.')  # Stage all tracked files
-    repo.git.add('*')  # Stage new files
-    repo.git.reset('HEAD', '.venv', '--')  # Unstage .venv directory if it was staged
-    return repo.git.diff('HEAD')
+    _run_git(worktree_path, "add", "-A", "--", ".", ":(exclude).venv")
+    return _run_git(worktree_path, "diff", "--cached", "HEAD")
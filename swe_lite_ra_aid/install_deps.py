@@ -1,31 +1,92 @@
 """Module for handling system dependency installation.
 
-DEPRECATED: This dynamic Python version installation is no longer used.
-Instead, install required Python versions manually using pyenv before running:
+`make install-pythons` runs this module to build LEGACY_PYTHON_VERSIONS with pyenv concurrently,
+do this once before running predictions:
+    python -m swe_lite_ra_aid.install_deps
 
-Example:
-    pyenv install 3.6.15
-    pyenv install 3.7.17
-    pyenv install 3.8.18
-    pyenv install 3.9.18
-
-The ensure_python_version() function is kept for reference but should not be used.
+DEPRECATED: Installing Python versions dynamically while processing tasks is no longer used.
+The ensure_build_dependencies() / ensure_python_version() helpers are kept for reference but should not be used.
 """
 
+import asyncio
+import functools
+import json
 import os
+import re
 from pathlib import Path
 import platform
+import signal
 import subprocess
 import logging
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Set
+from .io_utils import dump_json
 from .logger import logger
 
+# Neither changes while the process runs, so probe them once at import
+_IS_ARCH_LINUX = platform.system() == "Linux" and os.path.exists("/etc/arch-release")
+
+# Latest installable patch release per Python minor version, keyed by the pyenv version that listed them
+PYENV_VERSIONS_CACHE_FILE = Path.home() / ".cache" / "swe_lite_ra_aid" / "pyenv_versions.json"
+RELEASE_VERSION_RE = re.compile(r"(\d+)\.(\d+)\.(\d+)")
+
+# Legacy Python versions (<3.7) needed by older repository versions, installed by `make install-pythons`
+LEGACY_PYTHON_VERSIONS = ["3.5.10", "3.6.15"]
+# Lines of pyenv output logged when a build fails, python-build ends with the error and its build log path
+BUILD_LOG_TAIL_LINES = 40
+
+
+@functools.lru_cache(maxsize=None)
+def get_latest_pyenv_versions() -> Dict[str, str]:
+    """
+    Map each Python minor version pyenv can install to its latest patch release, e.g. {"3.6": "3.6.15"}.
+    The list only changes when pyenv itself is updated, so it is cached on disk keyed by `pyenv --version`.
+    """
+    pyenv_version = subprocess.run(
+        ["pyenv", "--version"], check=True, capture_output=True, text=True
+    ).stdout.strip()
+    try:
+        cache = json.loads(PYENV_VERSIONS_CACHE_FILE.read_text())
+        if cache["pyenv_version"] == pyenv_version:
+            return cache["versions"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    list_output = subprocess.run(
+        ["pyenv", "install", "--list"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    # Only final CPython releases like "3.6.15", compared numerically so 3.6.15 beats 3.6.9
+    latest_patches: Dict[str, int] = {}
+    for line in list_output.split("\n"):
+        match = RELEASE_VERSION_RE.fullmatch(line.strip())
+        if match:
+            minor = f"{match.group(1)}.{match.group(2)}"
+            latest_patches[minor] = max(int(match.group(3)), latest_patches.get(minor, -1))
+    versions = {minor: f"{minor}.{patch}" for minor, patch in latest_patches.items()}
+
+    PYENV_VERSIONS_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    PYENV_VERSIONS_CACHE_FILE.write_bytes(
+        dump_json({"pyenv_version": pyenv_version, "versions": versions})
+    )
+    return versions
+
 
 def ensure_build_dependencies():
     """Ensure all required build dependencies are installed on the system."""
 
     logger.info("ensure_build_dependencies()")
 
+    def get_installed_packages() -> Set[str]:
+        """Names of all installed packages, from a single pacman query."""
+        result = subprocess.run(
+            ["pacman", "-Qq"], capture_output=True, text=True, check=True
+        )
+        return set(result.stdout.split())
+
     def is_package_installed(package: str) -> bool:
         try:
             subprocess.run(
@@ -38,6 +99,20 @@ def ensure_build_dependencies():
         except subprocess.CalledProcessError:
             return False
 
+    def get_missing_packages(packages: List[str]) -> List[str]:
+        """
+        Return the packages that aren't installed. Falls back to querying each package
+        concurrently if listing all installed packages fails.
+        """
+        try:
+            installed_packages = get_installed_packages()
+            return [pkg for pkg in packages if pkg not in installed_packages]
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"pacman -Qq failed, checking packages one by one: {e}")
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                installed = list(executor.map(is_package_installed, packages))
+            return [pkg for pkg, ok in zip(packages, installed) if not ok]
+
     def install_from_aur(package: str):
         """Install a package from AUR using yay."""
         try:
@@ -45,58 +120,59 @@ def ensure_build_dependencies():
             subprocess.run(["which", "yay"], check=True, capture_output=True)
         except subprocess.CalledProcessError:
             logger.info("Installing yay (AUR helper)...")
-            subprocess.run(["sudo", "pacman", "-S", "--noconfirm", "yay"], check=True)
+            subprocess.run(
+                ["sudo", "pacman", "-S", "--needed", "--noconfirm", "yay"], check=True
+            )
 
         print(f"Installing {package} from AUR...")
         subprocess.run(["yay", "-S", "--noconfirm", package], check=True)
 
-    if platform.system() == "Linux":
-        logger.debug(f"system={platform.system}")
-        if os.path.exists("/etc/arch-release"):  # Arch-based systems
-            logger.debug("os.path exists")
-            required_packages = [
-                "base-devel",
-                "openssl",
-                "openssl-1.1",
-                "zlib",
-                "xz",
-                "tk",
-                "libffi",
-                "bzip2",
-                "sqlite",
-                "ncurses",
-                "readline",
-                "gdbm",
-                "db",
-                "expat",
-                "mpdecimal",
-                "libxcrypt",
-                "libxcrypt-compat",
-            ]
-
-            missing_packages = [
-                pkg for pkg in required_packages if not is_package_installed(pkg)
-            ]
-
-            if missing_packages:
-                logger.info(
-                    f"Installing missing build dependencies: {', '.join(missing_packages)}"
+    if _IS_ARCH_LINUX:
+        required_packages = [
+            "base-devel",
+            "openssl",
+            "openssl-1.1",
+            "zlib",
+            "xz",
+            "tk",
+            "libffi",
+            "bzip2",
+            "sqlite",
+            "ncurses",
+            "readline",
+            "gdbm",
+            "db",
+            "expat",
+            "mpdecimal",
+            "libxcrypt",
+            "libxcrypt-compat",
+        ]
+
+        # gcc10 comes from AUR, it is checked together with the rest but installed separately
+        missing = get_missing_packages(required_packages + ["gcc10"])
+        missing_packages = [pkg for pkg in missing if pkg != "gcc10"]
+
+        if missing_packages:
+            logger.info(
+                f"Installing missing build dependencies: {', '.join(missing_packages)}"
+            )
+            # No -y: refreshing the package databases is a network round trip per run, left to the user
+            try:
+                subprocess.run(
+                    ["sudo", "pacman", "-S", "--needed", "--noconfirm"]
+                    + missing_packages,
+                    check=True,
                 )
-                try:
-                    subprocess.run(
-                        ["sudo", "pacman", "-Sy", "--noconfirm"] + missing_packages,
-                        check=True,
-                    )
-                except subprocess.CalledProcessError as e:
-                    raise RuntimeError(f"Failed to install build dependencies: {e}")
+            except subprocess.CalledProcessError as e:
+                raise RuntimeError(f"Failed to install build dependencies: {e}")
 
-            # Install gcc10 from AUR if not already installed
-            if not is_package_installed("gcc10"):
-                logger.info("gcc10 not installed")
-                try:
-                    install_from_aur("gcc10")
-                except subprocess.CalledProcessError as e:
-                    raise RuntimeError(f"Failed to install gcc10 from AUR: {e}")
+        # Install gcc10 from AUR if not already installed
+        if "gcc10" in missing:
+            logger.info("gcc10 not installed")
+            try:
+                install_from_aur("gcc10")
+            except subprocess.CalledProcessError as e:
+                raise RuntimeError(f"Failed to install gcc10 from AUR: {e}")
 
     def ensure_python_version(version: str) -> str:
         """
@@ -117,28 +193,13 @@ def ensure_build_dependencies():
                     ["pyenv", "root"], check=True, capture_output=True, text=True
                 ).stdout.strip()
 
-                list_output = subprocess.run(
-                    ["pyenv", "install", "--list"],
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                ).stdout
-
                 # Find latest compatible version (e.g. 3.6.15 for version 3.6)
-                available_versions = [
-                    v.strip()
-                    for v in list_output.split("\n")
-                    if v.strip().startswith(f"{version}.")
-                ]
-                if not available_versions:
+                full_version = get_latest_pyenv_versions().get(version)
+                if not full_version:
                     raise RuntimeError(
                         f"No available Python {version}.x versions found"
                     )
 
-                full_version = sorted(available_versions)[
-                    -1
-                ]  # Get latest patch version
-
                 logging.info(f"Installing Python {full_version} using pyenv...")
 
                 # Install Python version using pyenv with verbose output
@@ -166,6 +227,50 @@ def ensure_build_dependencies():
                 )
 
 
+async def ensure_python_versions(versions: List[str]) -> None:
+    """
+    Install the given Python versions with pyenv concurrently.
+    Each build is a CPU heavy compile, so at most half as many builds as CPUs run at once.
+    A failed build doesn't stop the others, the failures are raised once every build is done.
+    """
+    semaphore = asyncio.Semaphore(max(1, (os.cpu_count() or 2) // 2))
+
+    async def install(version: str) -> None:
+        async with semaphore:
+            logger.info(f"Installing Python {version} using pyenv...")
+            process = await asyncio.create_subprocess_exec(
+                "pyenv",
+                "install",
+                "--skip-existing",
+                version,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True,
+            )
+            try:
+                output, _ = await process.communicate()
+            except asyncio.CancelledError:
+                # Interrupted, don't leave pyenv and its compiler processes building in the background
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                await process.wait()
+                raise
+            if process.returncode != 0:
+                tail = "\n".join(output.decode(errors="replace").splitlines()[-BUILD_LOG_TAIL_LINES:])
+                logger.error(f"Python {version} installation failed with exit code {process.returncode}:\n{tail}")
+                raise RuntimeError(f"Failed to install Python {version}")
+
+    results = await asyncio.gather(*(install(version) for version in versions), return_exceptions=True)
+    subprocess.run(["pyenv", "rehash"], check=True)
+
+    failed = [version for version, result in zip(versions, results) if isinstance(result, Exception)]
+    if failed:
+        first_error = next(result for result in results if isinstance(result, Exception))
+        raise RuntimeError(f"Failed to install Python {', '.join(failed)}") from first_error
+
+
 def uv_pip_install(repo_dir: Path, args: List[str]) -> None:
     """Run uv pip install with given arguments."""
     venv_path = repo_dir / ".venv"
@@ -228,3 +333,5 @@ def uv_pip_install(repo_dir: Path, args: List[str]) -> None:
                 os.environ.pop(var, None)
 
 
+if __name__ == "__main__":
+    asyncio.run(ensure_python_versions(LEGACY_PYTHON_VERSIONS))
@@ -1,37 +1,80 @@
 """Module for handling file and directory operations."""
 
+from collections import namedtuple
 from contextlib import contextmanager
 import json
 import os
+import time
 from pathlib import Path
 from typing import Optional
-from datetime import datetime
 from .logger import logger
 
+try:
+    import orjson
+except ImportError:  # Optional, falls back to the stdlib json module
+    orjson = None
+
+# Current winner of a task: its result file and the result dict written to it, kept in memory between
+# attempts so the winner file never has to be read back and parsed
+WinnerState = namedtuple("WinnerState", ["file", "result"])
+
+
+def dump_json(content: dict) -> bytes:
+    """
+    Serialize content to JSON indented by 2 spaces, with orjson when it is installed.
+    Strings that can't be encoded as UTF-8, like patches of non-UTF-8 files holding surrogate-escaped
+    bytes, are written as \\u escapes the way json.dumps does by default.
+    """
+    if orjson:
+        try:
+            return orjson.dumps(content, option=orjson.OPT_INDENT_2)
+        except TypeError:
+            pass  # orjson rejects lone surrogates, let the stdlib escape them
+    try:
+        return json.dumps(content, indent=2, ensure_ascii=False).encode()
+    except UnicodeEncodeError:
+        return json.dumps(content, indent=2).encode()
+
+
+def parse_json(raw: bytes):
+    """Parse JSON bytes, with orjson when it is installed."""
+    if orjson:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass  # orjson rejects the lone surrogate escapes dump_json can write, the stdlib accepts them
+    return json.loads(raw)
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write data to a temporary file next to path and swap it in, so readers never see a partial file."""
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def attempt_timestamp() -> str:
+    """Timestamp for the file names of one attempt, shared by its trajectory and result files."""
+    return time.strftime("%Y%m%d-%H%M%S")
+
 
 def handle_result_file(
-    out_dname: Path, task: dict, attempt: int, content: dict
+    out_dname: Path, task: dict, attempt: int, content: dict, timestamp: str
 ) -> tuple[bool, Optional[str], int, Path]:
     """
     Write result file and track winner status based on edited files and patch length.
     Returns: (success, winner_file, num_edited_files, attempt_fname)
     """
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
     attempt_fname = (
         out_dname / f"{task['instance_id']}-attempt{attempt}-{timestamp}.json"
     )
 
-    json_content = json.dumps(content, indent=4)
+    json_content = dump_json(content)
     logger.info(f"Writing to {attempt_fname} with content length: {len(json_content)}")
 
     try:
-        attempt_fname.write_text(json_content)
-        if not attempt_fname.exists():
-            logger.error(f"File {attempt_fname} does not exist after write attempt!")
-            return False, None, 0, attempt_fname
-
-        logger.info(f"Successfully wrote to {attempt_fname}")
-        logger.debug(f"File size: {attempt_fname.stat().st_size} bytes")
+        write_atomic(attempt_fname, json_content)
+        logger.info(f"Successfully wrote {len(json_content)} bytes to {attempt_fname}")
 
         edited_files = content.get("edited_files", [])
         return True, str(attempt_fname), len(edited_files), attempt_fname
@@ -47,14 +90,14 @@ def update_winner_file(
     result_file: str,
     num_edited: int,
     result: dict,
-    winner_file: Optional[str],
+    winner: Optional[WinnerState],
     max_edited_files: int,
-) -> tuple[str, int]:
+) -> tuple[Optional[WinnerState], int]:
     """
     Update winner file based on number of edited files and patch length.
     Updates is_winner field in both current and previous winner files.
     (WIP) Useful for prediction tracking if MAX_ATTEMPTS > 1, field is not used in report.py yet
-    Returns: (winner_file, max_edited_files)
+    Returns: (winner, max_edited_files)
     """
     output_files.append(attempt_fname)
 
@@ -62,35 +105,28 @@ def update_winner_file(
     if num_edited > max_edited_files:
         max_edited_files = num_edited
         new_winner = True
-    elif num_edited == max_edited_files and winner_file:
+    elif num_edited == max_edited_files and winner:
         current_patch = result.get("model_patch", "")
-        with open(winner_file) as f:
-            winner_result = json.loads(f.read())
-            winner_patch = winner_result.get("model_patch", "")
+        winner_patch = winner.result.get("model_patch", "")
         if len(current_patch) > len(winner_patch):
             new_winner = True
 
     if new_winner:
         # Unset previous winner if it exists
-        if winner_file:
-            with open(winner_file) as f:
-                prev_winner = json.loads(f.read())
-            prev_winner["is_winner"] = False
-            with open(winner_file, "w") as f:
-                json.dump(prev_winner, f, indent=4)
+        if winner:
+            winner.result["is_winner"] = False
+            write_atomic(Path(winner.file), dump_json(winner.result))
 
         # Set new winner
         result["is_winner"] = True
-        with open(result_file, "w") as f:
-            json.dump(result, f, indent=4)
-        winner_file = result_file
+        write_atomic(Path(result_file), dump_json(result))
+        winner = WinnerState(result_file, result)
     else:
         # Ensure current file is marked as not winner
         result["is_winner"] = False
-        with open(result_file, "w") as f:
-            json.dump(result, f, indent=4)
+        write_atomic(Path(result_file), dump_json(result))
 
-    return winner_file, max_edited_files
+    return winner, max_edited_files
 
 
 def setup_directories(out_dname: Path, repos_dname: Path) -> None:
@@ -110,17 +146,6 @@ def change_directory(path: Path):
         os.chdir(original_cwd)
 
 
-def save_trajectory(
-    out_dname: Path, task: dict, attempt: int, trajectory_output: str
-) -> Optional[Path]:
-    """Save trajectory output to a file and return the filename."""
-    if not trajectory_output:
-        return None
-
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    traj_fname = (
-        out_dname / f"traj_{task['instance_id']}_attempt{attempt}_{timestamp}.txt"
-    )
-    traj_fname.write_text(trajectory_output)
-    logger.info(f"Saved trajectory to {traj_fname}")
-    return traj_fname
+def get_trajectory_fname(out_dname: Path, task: dict, attempt: int, timestamp: str) -> Path:
+    """Return the filename the trajectory of this attempt should be written to."""
+    return out_dname / f"traj_{task['instance_id']}_attempt{attempt}_{timestamp}.txt"
@@ -1,6 +1,13 @@
 import logging
 import sys
 
+# Formatters are stateless, so one instance of each is shared by all handlers
+_FULL_FMT = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+_MINIMAL_FMT = logging.Formatter('%(message)s')
+
 def setup_logger(log_level=logging.INFO):
     """Setup and configure the logger
     
@@ -21,11 +28,7 @@ def setup_logger(log_level=logging.INFO):
     console_handler.setLevel(log_level)
     
     # Format with default full logging
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(_FULL_FMT)
     
     logger.addHandler(console_handler)
 
@@ -38,17 +41,15 @@ class MinimalLogger:
         
     def setLevel(self, level):
         self._logger.setLevel(level)
+
+    def isEnabledFor(self, level):
+        return self._logger.isEnabledFor(level)
         
     def set_minimal(self, minimal):
         self._minimal = minimal
+        formatter = _MINIMAL_FMT if minimal else _FULL_FMT
         for handler in self._logger.handlers:
-            if minimal:
-                handler.setFormatter(logging.Formatter('%(message)s'))
-            else:
-                handler.setFormatter(logging.Formatter(
-                    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    datefmt='%Y-%m-%d %H:%M:%S'
-                ))
+            handler.setFormatter(formatter)
     
     def debug(self, msg, *args, **kwargs):
         self._logger.debug(msg, *args, **kwargs)
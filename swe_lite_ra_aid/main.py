@@ -1,9 +1,10 @@
 import json
 import os
 import random
-import lox
 import tempfile
 import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
 from pathlib import Path
 from .logger import logger
 
@@ -31,11 +32,12 @@ from .io_utils import (
     change_directory,
     handle_result_file,
     update_winner_file,
-    save_trajectory,
+    get_trajectory_fname,
+    attempt_timestamp,
 )
 
 
-def process_single_attempt(task, _attempt, repo_manager):
+def process_single_attempt(task, _attempt, repo_manager, traj_fname):
     """Process a single attempt at solving the task"""
     github_url = "https://github.com/"
     repo_url = github_url + task["repo"]
@@ -62,22 +64,25 @@ def process_single_attempt(task, _attempt, repo_manager):
             os.environ["AIDER_PRETTY"] = "false"
             os.environ["AIDER_STREAM"] = "false"
 
-            trajectory_output, _returncode = run_ra_aid(worktree_path, planning_prompt)
+            ra_aid_result = run_ra_aid(worktree_path, planning_prompt, traj_fname)
 
-            if not trajectory_output:
+            if not ra_aid_result:
                 logger.warning("No output from RA.Aid")
                 return None, [], None, None
 
+            trajectory_file, _returncode = ra_aid_result
+            logger.info(f"Saved trajectory to {trajectory_file}")
+
             model_patch = stage_and_get_patch(worktree_path)
 
             if not model_patch:
                 logger.warning("❌ No changes made by RA.Aid")
-                return None, [], None, trajectory_output
+                return None, [], None, trajectory_file
 
             edited_files = files_in_patch(model_patch)
-            logger.debug(f"edited_files={edited_files}")
+            logger.debug("edited_files=%s", edited_files)
 
-            return model_patch, edited_files, None, trajectory_output
+            return model_patch, edited_files, None, trajectory_file
 
     except Exception as e:
         logger.error(f"Error in process_single_attempt: {str(e)}")
@@ -90,49 +95,47 @@ def ra_aid_prediction(task, out_dname, repo_manager):
     """Process one task using RA-AID approach with retries and result tracking"""
     results = []
     output_files = []
-    winner_file = None
+    winner = None
     max_edited_files = 0
 
     for attempt in range(1, MAX_ATTEMPTS + 1):
         logger.info("=" * 60)
         logger.info(f"Attempt {attempt} for {task['instance_id']}")
         logger.info("=" * 60)
+        timestamp = attempt_timestamp()
 
         try:
             with tempfile.TemporaryDirectory() as git_tempdir:
                 Path(git_tempdir).mkdir(parents=True, exist_ok=True)
 
-                model_patch, edited_files, research_result, trajectory_output = (
-                    process_single_attempt(task, attempt, repo_manager)
+                traj_fname = get_trajectory_fname(out_dname, task, attempt, timestamp)
+                model_patch, edited_files, research_result, trajectory_file = (
+                    process_single_attempt(task, attempt, repo_manager, traj_fname)
                 )
                 logger.info("Successfully completed process_single_attempt")
 
-                traj_fname = save_trajectory(
-                    out_dname, task, attempt, trajectory_output
-                )
-
                 result = create_result_dict(
                     task,
                     model_patch,
                     edited_files,
                     attempt,
-                    trajectory_file=traj_fname,
+                    trajectory_file=trajectory_file,
                     repo_manager=repo_manager,
                 )
                 results.append(result)
 
                 success, result_file, num_edited, attempt_fname = handle_result_file(
-                    out_dname, task, attempt, result
+                    out_dname, task, attempt, result, timestamp
                 )
 
                 if success:
-                    winner_file, max_edited_files = update_winner_file(
+                    winner, max_edited_files = update_winner_file(
                         output_files,
                         attempt_fname,
                         result_file,
                         num_edited,
                         result,
-                        winner_file,
+                        winner,
                         max_edited_files,
                     )
 
@@ -156,9 +159,10 @@ def ra_aid_prediction(task, out_dname, repo_manager):
 
             # Still try to write the result file
             success, result_file, num_edited, attempt_fname = handle_result_file(
-                out_dname, task, attempt, result
+                out_dname, task, attempt, result, timestamp
             )
 
+    winner_file = winner.file if winner else None
     if winner_file:
         logger.info(
             f"Winner file selected: {winner_file} with {max_edited_files} edited files"
@@ -193,7 +197,7 @@ def process_task(task, out_dname, repo_manager):
         }
     except Exception as e:
         logger.error(f"Error processing task {task.get('instance_id')}: {str(e)}")
-        return {"id": task["id"], "instance_id": task["instance_id"], "error": str(e)}
+        return {"instance_id": task.get("instance_id"), "error": str(e)}
 
 
 def get_completed_instances(out_dname):
@@ -240,6 +244,14 @@ def get_remaining_tasks(dataset, done_instances, filter_repos=None, only_tasks=N
     return remaining_instances
 
 
+def log_task_result(instance_id, task_result):
+    """Log the outcome of a finished task as soon as it completes."""
+    if "error" in task_result:
+        logger.error(f"Finished {instance_id} with error: {task_result['error']}")
+    else:
+        logger.info(f"Finished {instance_id}, winner file: {task_result['winner_file']}")
+
+
 def generate_predictions(dataset, out_dname, repo_manager):
     """Generate predictions with parallel processing and result tracking"""
     setup_directories(out_dname, REPOS_DNAME)
@@ -253,26 +265,31 @@ def generate_predictions(dataset, out_dname, repo_manager):
         only_tasks=ONLY_TASKS
     )
 
-    def scatter(task):
-        return process_task(task, out_dname, repo_manager)
-
-    gather = None
-
-    if MAX_THREADS > 1:
-        process_task_lox = lox.process(MAX_THREADS)(scatter)
-        scatter = process_task_lox.scatter
-        gather = process_task_lox.gather
-
     try:
-        for task in remaining_tasks:
-            if MAX_THREADS > 1:
-                scatter(task)
-            else:
-                process_task(task, out_dname, repo_manager)
-
         if MAX_THREADS > 1:
-            logger.info(f"Running {MAX_THREADS} threads.")
-            gather()
+            logger.info(f"Running {MAX_THREADS} processes.")
+            with ProcessPoolExecutor(max_workers=MAX_THREADS) as executor:
+                # Keep a bounded number of tasks in flight instead of submitting everything up front
+                tasks = iter(remaining_tasks)
+                futures = {}
+
+                def submit(n):
+                    for task in islice(tasks, n):
+                        futures[executor.submit(process_task, task, out_dname, repo_manager)] = task["instance_id"]
+
+                try:
+                    submit(2 * MAX_THREADS)
+                    while futures:
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            log_task_result(futures.pop(future), future.result())
+                        submit(len(done))
+                except KeyboardInterrupt:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+        else:
+            for task in remaining_tasks:
+                log_task_result(task["instance_id"], process_task(task, out_dname, repo_manager))
     except KeyboardInterrupt:
         logger.warning("\nGracefully shutting down...")
         return
@@ -4,12 +4,25 @@ import os
 from .logger import logger
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from git import Repo, exc as git_exc
+from .git import GIT_NETWORK_ENV, retry_git
 import tempfile
 from typing import Tuple
 import logging
 
+# Deletes removed worktrees in the background, so the next attempt doesn't wait on walking a whole checkout
+_TRASH_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="worktree-trash")
+
+
+def _remove_tree(path: Path) -> None:
+    """Delete a directory tree, logging instead of raising on failure."""
+    try:
+        shutil.rmtree(path)
+    except Exception as e:
+        logging.error(f"Error removing worktree directory: {e}")
+
 
 class RepoManager:
     def __init__(self, cache_root: Path):
@@ -100,7 +113,7 @@ class RepoManager:
             for item in cache_path.iterdir():
                 if item.name != ".git":
                     dest = venv_path / item.name
-                    logger.debug(f"Copying {item} -> {dest}")
+                    logger.debug("Copying %s -> %s", item, dest)
                     if item.is_dir():
                         shutil.copytree(item, dest, dirs_exist_ok=True)
                     else:
@@ -149,11 +162,11 @@ class RepoManager:
                     logger.info("Removing corrupted cache and trying fresh clone")
                     shutil.rmtree(cache_path)
                     cache_path.mkdir(parents=True, exist_ok=True)
-                    repo = Repo.clone_from(repo_url, str(cache_path))
+                    repo = retry_git(Repo.clone_from, repo_url, str(cache_path), env=GIT_NETWORK_ENV, no_tags=True)
             else:
                 cache_path.mkdir(parents=True, exist_ok=True)
                 logger.debug(f"Cloning {repo_url} to cache at {cache_path}")
-                repo = Repo.clone_from(repo_url, str(cache_path))
+                repo = retry_git(Repo.clone_from, repo_url, str(cache_path), env=GIT_NETWORK_ENV, no_tags=True)
 
             # Checkout correct commit
             repo.git.checkout(setup_commit)
@@ -249,7 +262,13 @@ class RepoManager:
         # except Exception as e:
         #     logging.error(f"Error removing worktree: {e}")
 
+        # Renaming is instant and frees the path right away, the actual deletion happens in the background
+        trash_path = worktree_path.with_name(f"{worktree_path.name}.trash")
         try:
-            shutil.rmtree(worktree_path)
-        except Exception as e:
-            logging.error(f"Error removing worktree directory: {e}")
+            os.rename(worktree_path, trash_path)
+        except OSError as e:
+            # Deleting the live path in the background would race with a new worktree created there
+            logging.error(f"Error moving worktree directory to trash, removing it in place: {e}")
+            _remove_tree(worktree_path)
+        else:
+            _TRASH_EXECUTOR.submit(_remove_tree, trash_path)
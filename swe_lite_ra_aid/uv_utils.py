@@ -1,10 +1,11 @@
 """Module for handling UV virtual environment setup and package installation."""
 
 import os
+import re
 from pathlib import Path
 import logging
 import subprocess
-from typing import Optional
+from typing import Dict, Optional
 
 from .io_utils import change_directory
 from .logger import logger
@@ -33,6 +34,52 @@ def get_python_version(repo: str, instance_version: str) -> Optional[str]:
     return version_map[instance_version].get("python", "3.9")
 
 
+# Version detection below is only used by the dataset_analyzer and version_validator analysis scripts.
+# The pipeline itself takes Python versions from dataset_constants via get_python_version above.
+# Files that may declare the Python version a repository targets, in order of precedence
+PYTHON_VERSION_FILES = (".python-version", "pyproject.toml", "setup.cfg", "setup.py")
+
+PYTHON_REQUIRES_RE = re.compile(r"""(?:requires-python|python_requires)\s*=\s*["']?([^"'\n]+)""")
+VERSION_NUMBER_RE = re.compile(r"\d+\.\d+(?:\.\d+)?")
+
+
+def detect_python_version_from_files(files: Dict[str, str]) -> Optional[str]:
+    """
+    Detect the minimum Python version a repository declares from the contents of its version files.
+
+    Args:
+        files: Mapping of file name (one of PYTHON_VERSION_FILES) to its contents, missing files omitted
+
+    Returns:
+        Python version as string (e.g. "3.7") or None if no version is declared
+    """
+    for name in PYTHON_VERSION_FILES:
+        content = files.get(name)
+        if not content:
+            continue
+
+        if name == ".python-version":
+            match = VERSION_NUMBER_RE.search(content)
+        else:
+            requires = PYTHON_REQUIRES_RE.search(content)
+            match = requires and VERSION_NUMBER_RE.search(requires.group(1))
+
+        if match:
+            return match.group(0)
+
+    return None
+
+
+def detect_python_version(repo_path: Path) -> Optional[str]:
+    """Detect the Python version declared by the repository checked out at repo_path."""
+    files = {}
+    for name in PYTHON_VERSION_FILES:
+        path = repo_path / name
+        if path.is_file():
+            files[name] = path.read_text(errors="replace")
+    return detect_python_version_from_files(files)
+
+
 def uv_venv(
     repo_dir: Path, repo_name: str, repo_version: str, force_venv: bool = False
 ) -> None:
@@ -249,7 +296,8 @@ def setup_venv_and_deps(
     logger.debug(f"force_venv: {force_venv}")
 
     with change_directory(repo_dir):
-        logger.debug(f"\nChanged directory to: {os.getcwd()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("\nChanged directory to: %s", os.getcwd())
         
         python_version = get_python_version(repo_name, repo_version)
         logger.info(f"Hardcoded python_version from constants.py: {python_version}")
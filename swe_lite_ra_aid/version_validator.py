@@ -27,16 +27,18 @@ def get_constant_python_version(repo: str, version: str) -> Optional[str]:
 
 def analyze_version_differences():
     """Compare detected Python versions with those defined in constants."""
-    dataset = load_dataset("princeton-nlp/SWE-bench_Lite", split="test")
+    # Read the three columns straight from the memory-mapped Arrow table of the cached split
+    table = load_dataset("princeton-nlp/SWE-bench_Lite", split="test").data
     
     # Collect repo versions and commits
     repo_versions: Dict[str, Set[str]] = defaultdict(set)
     repo_commits: Dict[str, Dict[str, str]] = defaultdict(dict)  # repo -> {commit -> version}
     
-    for instance in dataset:
-        repo = instance["repo"]
-        version = instance["version"]
-        commit = instance["environment_setup_commit"]
+    for repo, version, commit in zip(
+        table.column("repo").to_pylist(),
+        table.column("version").to_pylist(),
+        table.column("environment_setup_commit").to_pylist(),
+    ):
         repo_versions[repo].add(version)
         repo_commits[repo][commit] = version
     
@@ -98,7 +100,8 @@ if __name__ == "__main__":
     analyze_version_differences()
 
 # Results on 1/14/2025 show that detect_python_version() seems to detect all of them incorrectly :/
-# Deleted detect_python_version() in favor of hard-coded constants.py retrieval.
+# The pipeline uses hard-coded constants.py retrieval instead, detect_python_version() is only kept
+# for this comparison and dataset_analyzer.
 
 # Comparing Python Versions:
 # ================================================================================